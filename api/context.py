@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import os
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 from core.system import ClassAttendanceSystem
 
@@ -10,9 +13,43 @@ DATA_USERS_DIR.mkdir(parents=True, exist_ok=True)
 
 system = ClassAttendanceSystem(
     users_dir=str(DATA_USERS_DIR),
-    embeddings_file="data/known_faces.pkl",
+    embeddings_file="data/known_faces.npy",
     threshold=0.5,
 )
 
 startup_time = datetime.utcnow()
 
+# Upper bound on recognizer/enrollment calls running in worker threads at once
+INFER_CONCURRENCY = int(os.getenv("INFER_CONCURRENCY", "4"))
+_inference_slots = asyncio.Semaphore(INFER_CONCURRENCY)
+
+# Background embedding load started by the app's startup hook
+_recognizer_task: Optional[asyncio.Task] = None
+
+
+def start_recognizer_load() -> asyncio.Task:
+    """
+    Load the embeddings in a worker thread without blocking startup.
+    """
+    global _recognizer_task
+    _recognizer_task = asyncio.create_task(asyncio.to_thread(system._ensure_recognizer))
+    return _recognizer_task
+
+
+async def wait_for_recognizer() -> None:
+    """
+    Wait for the startup embedding load so requests don't race it with a second load.
+    A failed load is not fatal; the request path retries via _ensure_recognizer.
+    """
+    task = _recognizer_task
+    if task is not None and not task.done():
+        await asyncio.wait({task})
+
+
+async def run_inference(func, *args):
+    """
+    Run a blocking system call (recognition, enrollment, logging) in a worker
+    thread so the event loop stays responsive, capped at INFER_CONCURRENCY.
+    """
+    async with _inference_slots:
+        return await asyncio.to_thread(func, *args)
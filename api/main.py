@@ -1,21 +1,39 @@
 from __future__ import annotations
 
+import asyncio
 import csv
 import io
+import itertools
+import logging
+import queue
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, Iterator, Optional
 
-import cv2
-import numpy as np
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query
 from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from .context import system, startup_time
+from .context import run_inference, start_recognizer_load, system, startup_time, wait_for_recognizer
 from .models.schemas import HealthResponse
+from .utils import decode_image, read_upload
 from .routes import register, recognize, logs, users
 
+log = logging.getLogger(__name__)
+
+# Handlers only enqueue records; the listener thread does the stderr writes,
+# so logging a traceback never blocks the event loop
+_log_queue: queue.Queue = queue.Queue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = QueueListener(_log_queue, _log_handler)
+_queue_handler = QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+# Only the app's own loggers (api.*) go through the queue at INFO; the root logger,
+# and with it boto3/httpx logging, is left as the host process configured it
+_app_log = logging.getLogger("api")
+
 app = FastAPI(
     title="Face Attendance API",
     version="1.0.0",
@@ -34,14 +52,28 @@ if STATIC_DIR.exists():
 async def on_startup():
     """
     Optionally try to load embeddings on startup.
-    If they don't exist yet, it's fine – they will be built
-    on /register_face.
+    The load runs in a background thread so the server accepts requests
+    (/health, /users, ...) immediately. If there are no embeddings yet,
+    it's fine – they will be built on /register_face.
     """
-    try:
-        system._ensure_recognizer()
-    except Exception:
-        # No embeddings yet, ignore
-        pass
+    if _queue_handler not in _app_log.handlers:
+        _app_log.addHandler(_queue_handler)
+    _app_log.setLevel(logging.INFO)
+    _app_log.propagate = False
+    _log_listener.start()
+    start_recognizer_load().add_done_callback(_report_recognizer_load)
+
+
+def _report_recognizer_load(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        log.warning("Startup embedding load failed: %s", task.exception())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    _app_log.removeHandler(_queue_handler)
+    _app_log.propagate = True
+    _log_listener.stop()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -70,45 +102,26 @@ async def health() -> HealthResponse:
     )
 
 
-@app.post("/recognize")
-async def recognize_face(image: UploadFile = File(...)):
-    content = await image.read()
-    try:
-        rgb_frame, _ = _decode_image(content)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc))
-
-    try:
-        results = system.recognize_frame(rgb_frame)
-    except Exception as exc:
-        import traceback
-        traceback.print_exc()  # Print full error to terminal
-        raise HTTPException(status_code=500, detail=str(exc))
-
-    recognized = any(face["user_id"] != "Unknown" for face in results)
-    return {"results": results, "recognized": recognized}
-
-
 @app.post("/enroll")
 async def enroll(name: str = Form(...), image: UploadFile = File(...)):
     clean_name = name.strip()
     if not clean_name:
         raise HTTPException(status_code=400, detail="Name is required for enrollment")
 
-    content = await image.read()
+    content = await read_upload(image)
     try:
-        _, bgr_frame = _decode_image(content)
+        bgr_frame = await asyncio.to_thread(decode_image, content)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
+    await wait_for_recognizer()
     try:
-        system.enroll_user(clean_name, bgr_frame)
-        system.log_attendance(clean_name, source="web-ui")
+        await run_inference(system.enroll_user, clean_name, bgr_frame)
+        await run_inference(system.log_attendance, clean_name, "web-ui")
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
     except Exception as exc:
-        import traceback
-        traceback.print_exc()  # Print full error to terminal
+        log.exception("enroll failed")
         raise HTTPException(status_code=500, detail=str(exc))
 
     return {"status": "ok", "message": f"Enrolled {clean_name}"}
@@ -126,18 +139,34 @@ async def download_cloud_computing_csv(session_date: Optional[str] = Query(None,
     if session_date:
         filters["session_id"] = session_date
     
-    # Get records from DynamoDB
+    # Pull the first page from DynamoDB up front so fetch errors still map to a 500
+    records = system.logger.iter_records(filters)
     try:
-        records = system.logger.get_records(filters)
+        first = await asyncio.to_thread(next, records, None)
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Failed to fetch records: {str(exc)}")
+    if first is not None:
+        records = itertools.chain([first], records)
+
+    filename = f"CloudComputing_Attendance_{session_date or 'all'}.csv"
     
-    # Build CSV in memory
-    output = io.StringIO()
-    fieldnames = ["session_id", "face_id", "timestamp", "source", "course_name", "session_start", "session_end"]
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    # Rows are written as pages arrive; Starlette drives the sync generator in a threadpool
+    return StreamingResponse(
+        _iter_cloud_computing_csv(records),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+CLOUD_COMPUTING_CSV_FIELDS = ["session_id", "face_id", "timestamp", "source", "course_name", "session_start", "session_end"]
+CSV_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_cloud_computing_csv(records: Iterable[Dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CLOUD_COMPUTING_CSV_FIELDS)
     writer.writeheader()
-    
+
     for record in records:
         writer.writerow({
             "session_id": record.get("session_id", ""),
@@ -148,25 +177,12 @@ async def download_cloud_computing_csv(session_date: Optional[str] = Query(None,
             "session_start": record.get("session_start", ""),
             "session_end": record.get("session_end", ""),
         })
-    
-    output.seek(0)
-    filename = f"CloudComputing_Attendance_{session_date or 'all'}.csv"
-    
-    # Return as streaming response
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
-
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
 
-def _decode_image(data: bytes):
-    array = np.frombuffer(data, dtype=np.uint8)
-    bgr = cv2.imdecode(array, cv2.IMREAD_COLOR)
-    if bgr is None:
-        raise ValueError("Unable to decode image data")
-    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-    return rgb, bgr
+    yield buffer.getvalue()
 
 
 # Include routers from routes package
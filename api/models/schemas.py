@@ -18,6 +18,7 @@ class RecognizeResult(BaseModel):
 
 class RecognizeResponse(BaseModel):
     results: List[RecognizeResult]
+    recognized: bool = False
 
 
 class AttendanceRecord(BaseModel):
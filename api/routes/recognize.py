@@ -1,53 +1,45 @@
 # api/routes/recognize.py
 from __future__ import annotations
 
-import shutil
-import uuid
-from pathlib import Path
+import asyncio
+import logging
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
 
-from api.context import system
-from api.models.schemas import RecognizeResponse, RecognizeResult
+from api.context import run_inference, system, wait_for_recognizer
+from api.models.schemas import RecognizeResponse
+from api.utils import decode_image, read_upload
 
 router = APIRouter()
 
+log = logging.getLogger(__name__)
 
-@router.post("/recognize", response_model=RecognizeResponse)
+
+# Typed return: the model is validated once here and FastAPI serializes it straight
+# to JSON bytes through Pydantic, skipping jsonable_encoder
+@router.post("/recognize")
 async def recognize(image: UploadFile = File(...)) -> RecognizeResponse:
     ext = image.filename.split(".")[-1].lower()
     if ext not in {"jpg", "jpeg", "png"}:
         raise HTTPException(status_code=400, detail="Image must be jpg, jpeg, or png")
 
-    tmp_path = Path(f"/tmp/{uuid.uuid4()}.{ext}")
+    content = await read_upload(image)
     try:
-        with tmp_path.open("wb") as f:
-            shutil.copyfileobj(image.file, f)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save temporary image: {e}")
+        rgb_frame = await asyncio.to_thread(decode_image, content, True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    await wait_for_recognizer()
     try:
-        raw_results = system.recognize(str(tmp_path))
+        raw_results = await run_inference(system.recognize_frame, rgb_frame)
     except FileNotFoundError:
-        tmp_path.unlink(missing_ok=True)
         raise HTTPException(
             status_code=500,
             detail="Embedding database not found. Register at least one user first.",
         )
     except Exception as e:
-        import traceback
-        traceback.print_exc()  # Print full error to terminal
-        tmp_path.unlink(missing_ok=True)
+        log.exception("recognize failed")
         raise HTTPException(status_code=500, detail=f"Recognition failed: {e}")
 
-    tmp_path.unlink(missing_ok=True)
-
-    results = [
-        RecognizeResult(
-            user_id=r.get("user_id", "Unknown"),
-            distance=float(r.get("distance", 1.0)),
-            bbox=list(r.get("bbox")) if r.get("bbox") is not None else None,
-        )
-        for r in raw_results
-    ]
-    return RecognizeResponse(results=results)
+    recognized = any(face["user_id"] != "Unknown" for face in raw_results)
+    return RecognizeResponse(results=raw_results, recognized=recognized)
@@ -1,16 +1,21 @@
 # api/routes/register.py
 from __future__ import annotations
 
-import shutil
+import asyncio
+import logging
 import uuid
+from pathlib import Path
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 
-from api.context import system, DATA_USERS_DIR
+from api.context import run_inference, system, wait_for_recognizer, DATA_USERS_DIR
 from api.models.schemas import RegisterResponse
+from api.utils import decode_image, read_upload
 
 router = APIRouter()
 
+log = logging.getLogger(__name__)
+
 
 @router.post("/register_face", response_model=RegisterResponse)
 async def register_face(
@@ -24,25 +29,46 @@ async def register_face(
     if ext not in {"jpg", "jpeg", "png"}:
         raise HTTPException(status_code=400, detail="Image must be jpg, jpeg, or png")
 
-    user_dir = DATA_USERS_DIR / user_id
-    user_dir.mkdir(parents=True, exist_ok=True)
+    content = await read_upload(image)
+    try:
+        bgr_frame = await asyncio.to_thread(decode_image, content)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    filename = f"{uuid.uuid4()}.{ext}"
-    image_path = user_dir / filename
+    # Encode and store only the new face instead of rebuilding every embedding
+    await wait_for_recognizer()
+    try:
+        await run_inference(system.enroll_user, user_id, bgr_frame)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        log.exception("register_face failed")
+        raise HTTPException(status_code=500, detail=f"Failed to enroll face: {e}")
 
+    # Keep a local copy of the upload once enrollment succeeded (written off the event loop)
+    image_path = DATA_USERS_DIR / user_id / f"{uuid.uuid4()}.{ext}"
     try:
-        with image_path.open("wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        await asyncio.to_thread(_save_upload, image_path, content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save image: {e}")
 
-    # Rebuild embeddings using core system
+    return RegisterResponse(success=True, message=f"Face registered for user '{user_id}'")
+
+
+@router.post("/rebuild", response_model=RegisterResponse)
+async def rebuild_embeddings() -> RegisterResponse:
+    """
+    Admin route: re-encode every stored user image and replace the embedding database.
+    """
     try:
-        system.build_database()
+        embeddings = await run_inference(system.build_database)
     except Exception as e:
-        import traceback
-        traceback.print_exc()  # Print full error to terminal
-        image_path.unlink(missing_ok=True)
+        log.exception("rebuild failed")
         raise HTTPException(status_code=500, detail=f"Failed to rebuild embeddings: {e}")
 
-    return RegisterResponse(success=True, message=f"Face registered for user '{user_id}'")
+    return RegisterResponse(success=True, message=f"Rebuilt embeddings for {len(embeddings)} users")
+
+
+def _save_upload(image_path: Path, content: bytearray) -> None:
+    image_path.parent.mkdir(parents=True, exist_ok=True)
+    image_path.write_bytes(content)
@@ -2,26 +2,46 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Dict, Tuple
 
 from fastapi import APIRouter
 
+from api.context import DATA_USERS_DIR
 from api.models.schemas import UsersResponse, UserInfo
 
 router = APIRouter()
 
-DATA_USERS_DIR = Path("data/users")
+# user_id -> (directory mtime, photo count); a directory's mtime changes whenever
+# a photo is added or removed, so an unchanged mtime means the count is still valid.
+# The handler never awaits while touching this dict, so no lock is needed.
+_photo_counts: Dict[str, Tuple[float, int]] = {}
 
 
 @router.get("/users", response_model=UsersResponse)
 async def list_users() -> UsersResponse:
     if not DATA_USERS_DIR.exists():
+        _photo_counts.clear()
         return UsersResponse(users=[])
 
     users = []
+    seen = set()
     for user_dir in DATA_USERS_DIR.iterdir():
         if not user_dir.is_dir():
             continue
-        photo_count = sum(1 for p in user_dir.iterdir() if p.is_file())
-        users.append(UserInfo(user_id=user_dir.name, photo_count=photo_count))
+        seen.add(user_dir.name)
+        users.append(UserInfo(user_id=user_dir.name, photo_count=_photo_count(user_dir)))
+
+    for stale in _photo_counts.keys() - seen:
+        del _photo_counts[stale]
 
     return UsersResponse(users=users)
+
+
+def _photo_count(user_dir: Path) -> int:
+    mtime = user_dir.stat().st_mtime
+    cached = _photo_counts.get(user_dir.name)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    photo_count = sum(1 for p in user_dir.iterdir() if p.is_file())
+    _photo_counts[user_dir.name] = (mtime, photo_count)
+    return photo_count
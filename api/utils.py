@@ -0,0 +1,42 @@
+# api/utils.py
+from __future__ import annotations
+
+import os
+
+import cv2
+import numpy as np
+from fastapi import HTTPException, UploadFile
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def read_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytearray:
+    """
+    Read an upload in chunks, rejecting it with 413 as soon as it exceeds max_bytes
+    instead of buffering an oversized payload first.
+    """
+    data = bytearray()
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        data.extend(chunk)
+        if len(data) > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Image exceeds the {max_bytes} byte upload limit",
+            )
+    return data
+
+
+def decode_image(data: bytearray, rgb: bool = False) -> np.ndarray:
+    """
+    Decode uploaded image bytes into a BGR frame, or an RGB frame when `rgb` is set.
+    The channel swap is done in place so no second full-frame buffer is allocated.
+    CPU-bound, so callers run it off the event loop.
+    """
+    array = np.frombuffer(memoryview(data), dtype=np.uint8)
+    frame = cv2.imdecode(array, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Unable to decode image data")
+    if rgb:
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+    return frame
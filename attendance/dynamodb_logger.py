@@ -8,12 +8,20 @@ for seamless integration.
 
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta, timezone
 from typing import Dict, List, Optional
 
-import boto3
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 
+from aws.config import get_dynamodb_resource
+
+# GSI keyed by (event_date, timestamp) for date-range reads across all users
+BY_DAY_INDEX = "by_day"
+# Longer ranges go back to a Scan rather than issuing one Query per day
+MAX_DAY_QUERIES = 31
+
 
 class DynamoDBLogger:
     """
@@ -41,9 +49,14 @@ class DynamoDBLogger:
         self.table_name = table_name
         self.region = region
         
-        # Initialize DynamoDB client and resource
-        self.dynamodb = boto3.resource("dynamodb", region_name=region)
+        # Shared per-region resource; loggers and helpers reuse one session and pool
+        self.dynamodb = get_dynamodb_resource(region)
         self.table = self.dynamodb.Table(table_name)
+        # user_id -> most recent record (or None), filled on first lookup and after
+        # every successful write so duplicate checks don't re-query the table
+        self._last_events: Dict[str, Optional[Dict]] = {}
+        # user_id -> epoch seconds of that record (0.0 if none), for is_duplicate
+        self._last_seen: Dict[str, float] = {}
         
         if create_table:
             self._ensure_table_exists()
@@ -65,6 +78,17 @@ class DynamoDBLogger:
                     AttributeDefinitions=[
                         {"AttributeName": "user_id", "AttributeType": "S"},
                         {"AttributeName": "timestamp", "AttributeType": "S"},
+                        {"AttributeName": "event_date", "AttributeType": "S"},
+                    ],
+                    GlobalSecondaryIndexes=[
+                        {
+                            "IndexName": BY_DAY_INDEX,
+                            "KeySchema": [
+                                {"AttributeName": "event_date", "KeyType": "HASH"},
+                                {"AttributeName": "timestamp", "KeyType": "RANGE"},
+                            ],
+                            "Projection": {"ProjectionType": "ALL"},
+                        }
                     ],
                     BillingMode="PAY_PER_REQUEST",
                 )
@@ -87,16 +111,20 @@ class DynamoDBLogger:
         if self.is_duplicate(user_id):
             return False
 
-        timestamp = datetime.utcnow().isoformat()
+        now = time.time()
+        # Stored as naive UTC ISO-8601, same format as before
+        timestamp = datetime.fromtimestamp(now, tz=timezone.utc).replace(tzinfo=None).isoformat()
+        item = {
+            "user_id": user_id,
+            "timestamp": timestamp,
+            "source": source,
+            "event_date": timestamp[:10],
+        }
         
         try:
-            self.table.put_item(
-                Item={
-                    "user_id": user_id,
-                    "timestamp": timestamp,
-                    "source": source,
-                }
-            )
+            self.table.put_item(Item=item)
+            self._last_events[user_id] = item
+            self._last_seen[user_id] = now
             return True
         except ClientError as e:
             raise RuntimeError(f"Failed to write to DynamoDB: {e}")
@@ -112,24 +140,43 @@ class DynamoDBLogger:
         Returns:
             True if a record exists within the interval, False otherwise
         """
-        last_event = self.get_last_event(user_id)
-        if not last_event:
-            return False
-        last_time = datetime.fromisoformat(last_event["timestamp"])
-        return datetime.utcnow() - last_time < timedelta(minutes=interval_minutes)
+        last_seen = self._last_seen.get(user_id)
+        if last_seen is None:
+            # Parse the stored timestamp once; later checks are a float compare
+            last_event = self.get_last_event(user_id)
+            last_seen = _epoch_seconds(last_event["timestamp"]) if last_event else 0.0
+            self._last_seen[user_id] = last_seen
+        return time.time() - last_seen < interval_minutes * 60
 
     def get_last_event(self, user_id: str) -> Optional[Dict]:
         """
         Get the most recent attendance record for a user.
         
+        Served from the in-memory cache after the first lookup for a user; only
+        writes from this logger are reflected, which covers the duplicate check.
+        
         Args:
             user_id: ID of the user
             
         Returns:
             Dictionary with the last event or None if no events exist
         """
-        records = self.get_records({"user_id": user_id})
-        return records[-1] if records else None
+        if user_id in self._last_events:
+            return self._last_events[user_id]
+        # Newest first on the timestamp sort key: a single item read, however many
+        # records the user has
+        try:
+            response = self.table.query(
+                KeyConditionExpression=Key("user_id").eq(user_id),
+                ScanIndexForward=False,
+                Limit=1,
+            )
+        except ClientError as e:
+            raise RuntimeError(f"Failed to query DynamoDB: {e}")
+        items = response.get("Items", [])
+        last_event = items[0] if items else None
+        self._last_events[user_id] = last_event
+        return last_event
 
     def get_records(self, filters: Optional[Dict] = None) -> List[Dict]:
         """
@@ -145,34 +192,110 @@ class DynamoDBLogger:
             List of attendance records
         """
         filters = filters or {}
-        rows: List[Dict] = []
+        start_date = filters.get("start_date")
+        end_date = filters.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            # DynamoDB rejects a reversed BETWEEN; nothing can match it anyway
+            return []
 
-        try:
-            if "user_id" in filters:
-                # Query by user_id (partition key)
-                response = self.table.query(
-                    KeyConditionExpression="user_id = :user_id",
-                    ExpressionAttributeValues={":user_id": filters["user_id"]},
-                )
-                items = response.get("Items", [])
-            else:
-                # Scan the entire table (less efficient)
-                response = self.table.scan()
-                items = response.get("Items", [])
-
-            # Apply date range filters
-            for item in items:
-                if filters.get("start_date"):
-                    if item["timestamp"] < filters["start_date"]:
-                        continue
-                if filters.get("end_date"):
-                    if item["timestamp"] > filters["end_date"]:
-                        continue
-                rows.append(item)
-
-            # Sort by timestamp in ascending order
-            rows.sort(key=lambda x: x["timestamp"])
-            return rows
+        request: Dict = {}
+        is_scan = "user_id" not in filters
+        if not is_scan:
+            # Query by user_id (partition key); the date range is a sort-key condition,
+            # so DynamoDB only reads the matching slice, already ordered by timestamp
+            key_condition = Key("user_id").eq(filters["user_id"])
+            timestamp_condition = _timestamp_condition(Key("timestamp"), start_date, end_date)
+            if timestamp_condition is not None:
+                key_condition = key_condition & timestamp_condition
+            request["KeyConditionExpression"] = key_condition
+            fetch = self.table.query
+        else:
+            days = _days_in_range(start_date, end_date)
+            if days is not None:
+                try:
+                    return self._query_by_day(days, start_date, end_date)
+                except ClientError as e:
+                    # Tables created before the index existed have no by_day GSI
+                    if e.response["Error"]["Code"] != "ValidationException":
+                        raise RuntimeError(f"Failed to query DynamoDB: {e}")
+            # Scan the entire table (less efficient); filter server-side at least
+            timestamp_condition = _timestamp_condition(Attr("timestamp"), start_date, end_date)
+            if timestamp_condition is not None:
+                request["FilterExpression"] = timestamp_condition
+            fetch = self.table.scan
 
+        try:
+            rows: List[Dict] = []
+            response = fetch(**request)
+            rows.extend(response.get("Items", []))
+            while "LastEvaluatedKey" in response:
+                response = fetch(ExclusiveStartKey=response["LastEvaluatedKey"], **request)
+                rows.extend(response.get("Items", []))
         except ClientError as e:
             raise RuntimeError(f"Failed to query DynamoDB: {e}")
+
+        if is_scan:
+            # Scan order is arbitrary; sort by timestamp in ascending order
+            rows.sort(key=lambda x: x["timestamp"])
+        return rows
+
+    def _query_by_day(self, days: List[str], start_date: str, end_date: str) -> List[Dict]:
+        """
+        One by_day Query per event_date; each returns that day's slice in timestamp
+        order, so walking the days in order yields the rows already sorted.
+        """
+        timestamp_condition = _timestamp_condition(Key("timestamp"), start_date, end_date)
+        rows: List[Dict] = []
+        for day in days:
+            request = {
+                "IndexName": BY_DAY_INDEX,
+                "KeyConditionExpression": Key("event_date").eq(day) & timestamp_condition,
+            }
+            response = self.table.query(**request)
+            rows.extend(response.get("Items", []))
+            while "LastEvaluatedKey" in response:
+                response = self.table.query(ExclusiveStartKey=response["LastEvaluatedKey"], **request)
+                rows.extend(response.get("Items", []))
+        return rows
+
+
+def _days_in_range(start_date: Optional[str], end_date: Optional[str]) -> Optional[List[str]]:
+    """
+    The YYYY-MM-DD event_date values covering a closed date range ([] if it is
+    reversed), or None when the range is open-ended, unparseable or longer than
+    MAX_DAY_QUERIES days.
+    """
+    if not (start_date and end_date):
+        return None
+    try:
+        first = date.fromisoformat(start_date[:10])
+        last = date.fromisoformat(end_date[:10])
+    except ValueError:
+        return None
+    count = (last - first).days + 1
+    if count <= 0:
+        return []
+    if count > MAX_DAY_QUERIES:
+        return None
+    return [(first + timedelta(days=offset)).isoformat() for offset in range(count)]
+
+
+def _epoch_seconds(timestamp: str) -> float:
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _timestamp_condition(field, start_date: Optional[str], end_date: Optional[str]):
+    """
+    Build a timestamp range condition on a Key (sort-key condition) or Attr (filter).
+    Callers must rule out start_date > end_date first; DynamoDB rejects that BETWEEN.
+    """
+    if start_date and end_date:
+        return field.between(start_date, end_date)
+    if start_date:
+        return field.gte(start_date)
+    if end_date:
+        return field.lte(end_date)
+    return None
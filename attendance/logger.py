@@ -1,12 +1,20 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Dict, List, Optional
+import time
+from datetime import date, datetime, timezone
+from typing import ClassVar, Dict, Iterator, List, Optional, Set, Tuple
 
-import boto3
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 
-from aws.config import ATTENDANCE_TABLE, get_boto3_session_kwargs
+from aws.config import ATTENDANCE_TABLE, get_dynamodb_resource
+
+SECONDS_PER_DAY = 86400
+# get_last_event probes this many recent daily sessions by key before scanning
+RECENT_SESSION_LOOKBACK = 7
+# Date ranges up to this many days are read as one Query per daily session
+MAX_RANGE_SESSIONS = 62
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
 
 
 class AttendanceLogger:
@@ -16,15 +24,25 @@ class AttendanceLogger:
     entry per user per day (similar to the former duplicate-prevention logic).
     """
 
+    # (UTC day number, "YYYYMMDD"); the session id only changes at midnight
+    _cached_session: ClassVar[Tuple[int, str]] = (-1, "")
+
     def __init__(self) -> None:
-        session_kwargs = get_boto3_session_kwargs()
-        dynamodb = boto3.resource("dynamodb", **session_kwargs)
-        self.table = dynamodb.Table(ATTENDANCE_TABLE)
+        self.table = get_dynamodb_resource().Table(ATTENDANCE_TABLE)
+        # (session_id, face_ids known to have a row in it); lets repeat calls within
+        # a day, e.g. one per webcam frame, return without a conditional write
+        self._logged_session: Tuple[str, Set[str]] = ("", set())
 
     def log(self, user_id: str, source: str = "camera") -> bool:
-        timestamp = datetime.utcnow()
-        session_id = timestamp.strftime("%Y%m%d")
-        iso_timestamp = timestamp.isoformat()
+        now = time.time()
+        session_id = self._session_id_for(now)
+        if self._logged_session[0] != session_id:
+            self._logged_session = (session_id, set())
+        logged = self._logged_session[1]
+        if user_id in logged:
+            return False
+        # Stored as naive UTC ISO-8601, same format as before
+        iso_timestamp = datetime.fromtimestamp(now, tz=timezone.utc).replace(tzinfo=None).isoformat()
         try:
             self.table.put_item(
                 Item={
@@ -35,51 +53,154 @@ class AttendanceLogger:
                 },
                 ConditionExpression="attribute_not_exists(face_id)",
             )
+            logged.add(user_id)
             return True
         except ClientError as exc:
             if exc.response["Error"]["Code"] == "ConditionalCheckFailedException":
                 # Already logged for this session (day)
+                logged.add(user_id)
                 return False
             raise
 
+    @classmethod
+    def _session_id_for(cls, epoch_seconds: float) -> str:
+        day = int(epoch_seconds // SECONDS_PER_DAY)
+        if cls._cached_session[0] != day:
+            cls._cached_session = (day, cls._format_session_id(day))
+        return cls._cached_session[1]
+
+    @staticmethod
+    def _format_session_id(day: int) -> str:
+        day_start = datetime.fromtimestamp(day * SECONDS_PER_DAY, tz=timezone.utc)
+        return f"{day_start.year:04d}{day_start.month:02d}{day_start.day:02d}"
+
     def get_last_event(self, user_id: str) -> Optional[Dict]:
-        records = self.get_records({"user_id": user_id})
-        if not records:
-            return None
-        return max(records, key=lambda row: row["timestamp"])
+        recent = next(self._iter_recent_events(user_id), None)
+        if recent is not None:
+            return recent
+        # Not seen lately; stream the user's rows and keep only the newest
+        return max(
+            self.iter_records({"user_id": user_id}),
+            key=lambda row: row["timestamp"],
+            default=None,
+        )
+
+    def _iter_recent_events(self, user_id: str) -> Iterator[Dict]:
+        """
+        Yield the user's events newest session first, one GetItem per day, for the
+        last RECENT_SESSION_LOOKBACK days. There is at most one event per
+        (session_id, face_id), so the first hit is the most recent event.
+        """
+        today = int(time.time() // SECONDS_PER_DAY)
+        for day in range(today, today - RECENT_SESSION_LOOKBACK, -1):
+            response = self.table.get_item(
+                Key={"session_id": self._format_session_id(day), "face_id": user_id}
+            )
+            if "Item" in response:
+                yield self._to_record(response["Item"])
 
     def get_records(self, filters: Optional[Dict] = None) -> List[Dict]:
+        return list(self.iter_records(filters))
+
+    def iter_records(self, filters: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Yield attendance rows matching the filters, one DynamoDB page at a time.
+        A session_id (the table's partition key), or a bounded date range, turns
+        this into per-session Queries; otherwise we fall back to a Scan. Remaining
+        filters are evaluated server-side via FilterExpression.
+        """
         filters = filters or {}
-        items: List[Dict] = []
-        response = self.table.scan()
-        items.extend(response.get("Items", []))
-        while "LastEvaluatedKey" in response:
-            response = self.table.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
-            items.extend(response.get("Items", []))
-
-        def _match(item: Dict) -> bool:
-            if filters.get("user_id") and item.get("face_id") != filters["user_id"]:
-                return False
-            if filters.get("session_id") and item.get("session_id") != filters["session_id"]:
-                return False
-            if filters.get("course_name") and item.get("course_name") != filters["course_name"]:
-                return False
-            if filters.get("start_date") and item.get("timestamp", "") < filters["start_date"]:
-                return False
-            if filters.get("end_date") and item.get("timestamp", "") > filters["end_date"]:
-                return False
-            return True
+        start_date, end_date = filters.get("start_date"), filters.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            # between() rejects a reversed range; nothing can match it anyway
+            return
+        if filters.get("session_id"):
+            session_ids: Optional[List[str]] = [filters["session_id"]]
+        else:
+            session_ids = self._sessions_in_range(start_date, end_date)
+
+        request: Dict = {}
+        filter_expression = self._build_filter_expression(filters, keyed=session_ids is not None)
+        if filter_expression is not None:
+            request["FilterExpression"] = filter_expression
+
+        if session_ids is None:
+            yield from self._paginate(self.table.scan, request)
+            return
+        for session_id in session_ids:
+            key_condition = Key("session_id").eq(session_id)
+            if filters.get("user_id"):
+                key_condition = key_condition & Key("face_id").eq(filters["user_id"])
+            yield from self._paginate(
+                self.table.query, {**request, "KeyConditionExpression": key_condition}
+            )
 
+    def _paginate(self, fetch, request: Dict) -> Iterator[Dict]:
+        response = fetch(**request)
+        while True:
+            for item in response.get("Items", []):
+                yield self._to_record(item)
+            if "LastEvaluatedKey" not in response:
+                break
+            response = fetch(ExclusiveStartKey=response["LastEvaluatedKey"], **request)
+
+    @staticmethod
+    def _sessions_in_range(start_date: Optional[str], end_date: Optional[str]) -> Optional[List[str]]:
+        """
+        Session ids are the UTC day of each event, so a bounded date range maps to
+        one Query per day instead of a full-table Scan. Returns [] for a reversed
+        range and None when it is open-ended, unparseable or longer than
+        MAX_RANGE_SESSIONS days.
+        """
+        if not (start_date and end_date):
+            return None
+        try:
+            first = date.fromisoformat(start_date[:10])
+            last = date.fromisoformat(end_date[:10])
+        except ValueError:
+            return None
+        days = (last - first).days + 1
+        if days <= 0:
+            return []
+        if days > MAX_RANGE_SESSIONS:
+            return None
         return [
-            {
-                "timestamp": item.get("timestamp"),
-                "user_id": item.get("face_id"),
-                "source": item.get("source"),
-                "session_id": item.get("session_id"),
-                "course_name": item.get("course_name"),
-                "session_start": item.get("session_start"),
-                "session_end": item.get("session_end"),
-            }
-            for item in items
-            if _match(item)
+            AttendanceLogger._format_session_id(day)
+            for day in range(first.toordinal() - EPOCH_ORDINAL, last.toordinal() - EPOCH_ORDINAL + 1)
         ]
+
+    @staticmethod
+    def _to_record(item: Dict) -> Dict:
+        return {
+            "timestamp": item.get("timestamp"),
+            "user_id": item.get("face_id"),
+            "source": item.get("source"),
+            "session_id": item.get("session_id"),
+            "course_name": item.get("course_name"),
+            "session_start": item.get("session_start"),
+            "session_end": item.get("session_end"),
+        }
+
+    @staticmethod
+    def _build_filter_expression(filters: Dict, keyed: bool):
+        conditions = []
+        # face_id is only a key attribute when paired with session_id in a Query
+        if filters.get("user_id") and not keyed:
+            conditions.append(Attr("face_id").eq(filters["user_id"]))
+        if filters.get("course_name"):
+            conditions.append(Attr("course_name").eq(filters["course_name"]))
+        start_date = filters.get("start_date")
+        end_date = filters.get("end_date")
+        if start_date and end_date:
+            conditions.append(Attr("timestamp").between(start_date, end_date))
+        elif start_date:
+            conditions.append(Attr("timestamp").gte(start_date))
+        elif end_date:
+            conditions.append(Attr("timestamp").lte(end_date))
+
+        if not conditions:
+            return None
+        expression = conditions[0]
+        for condition in conditions[1:]:
+            expression = expression & condition
+        return expression
@@ -1,11 +1,25 @@
 from __future__ import annotations
 
 import os
+import threading
+from typing import Dict, Optional
+
+import boto3
+from botocore.config import Config
 
 AWS_REGION = os.getenv("AWS_REGION", "eu-north-1")
 S3_BUCKET = os.getenv("S3_BUCKET", "facerecognition")
 FACES_TABLE = os.getenv("FACES_TABLE", "FacesTable")
 ATTENDANCE_TABLE = os.getenv("ATTENDANCE_TABLE", "Attendance")
+MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+
+# Sized for the API's worker threads all talking to AWS at once
+BOTO_CONFIG = Config(max_pool_connections=MAX_POOL_CONNECTIONS)
+
+_lock = threading.RLock()
+_session: Optional[boto3.session.Session] = None
+_dynamodb_resources: Dict[str, object] = {}
+_s3_client = None
 
 def get_boto3_session_kwargs() -> dict:
     """
@@ -14,3 +28,38 @@ def get_boto3_session_kwargs() -> dict:
     """
     return {"region_name": AWS_REGION}
 
+
+def get_boto3_session() -> boto3.session.Session:
+    """
+    Process-wide boto3 session, so credentials and service models are resolved once.
+    Sessions are not thread-safe, hence the lock around creating clients from it.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session(**get_boto3_session_kwargs())
+        return _session
+
+
+def get_dynamodb_resource(region: Optional[str] = None):
+    """
+    Shared DynamoDB resource per region (default AWS_REGION); every table handle
+    built from one reuses its HTTP pool.
+    """
+    region = region or AWS_REGION
+    with _lock:
+        resource = _dynamodb_resources.get(region)
+        if resource is None:
+            resource = get_boto3_session().resource(
+                "dynamodb", region_name=region, config=BOTO_CONFIG
+            )
+            _dynamodb_resources[region] = resource
+        return resource
+
+
+def get_s3_client():
+    global _s3_client
+    with _lock:
+        if _s3_client is None:
+            _s3_client = get_boto3_session().client("s3", config=BOTO_CONFIG)
+        return _s3_client
@@ -7,9 +7,10 @@ for attendance logging.
 
 from __future__ import annotations
 
-import boto3
 from botocore.exceptions import ClientError
 
+from aws.config import get_dynamodb_resource
+
 
 def create_attendance_table(
     table_name: str = "attendance_records",
@@ -25,7 +26,7 @@ def create_attendance_table(
     Returns:
         Dictionary with table creation status
     """
-    dynamodb = boto3.resource("dynamodb", region_name=region)
+    dynamodb = get_dynamodb_resource(region)
     
     try:
         table = dynamodb.Table(table_name)
@@ -47,6 +48,17 @@ def create_attendance_table(
                     AttributeDefinitions=[
                         {"AttributeName": "user_id", "AttributeType": "S"},
                         {"AttributeName": "timestamp", "AttributeType": "S"},
+                        {"AttributeName": "event_date", "AttributeType": "S"},
+                    ],
+                    GlobalSecondaryIndexes=[
+                        {
+                            "IndexName": "by_day",
+                            "KeySchema": [
+                                {"AttributeName": "event_date", "KeyType": "HASH"},
+                                {"AttributeName": "timestamp", "KeyType": "RANGE"},
+                            ],
+                            "Projection": {"ProjectionType": "ALL"},
+                        }
                     ],
                     BillingMode="PAY_PER_REQUEST",
                     Tags=[
@@ -91,7 +103,7 @@ def delete_attendance_table(
     Returns:
         Dictionary with deletion status
     """
-    dynamodb = boto3.resource("dynamodb", region_name=region)
+    dynamodb = get_dynamodb_resource(region)
     
     try:
         table = dynamodb.Table(table_name)
@@ -124,7 +136,7 @@ def get_table_info(
     Returns:
         Dictionary with table information
     """
-    dynamodb = boto3.resource("dynamodb", region_name=region)
+    dynamodb = get_dynamodb_resource(region)
     
     try:
         table = dynamodb.Table(table_name)
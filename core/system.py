@@ -1,66 +1,124 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, List, Optional, Tuple
 
 import cv2
 import face_recognition
 import numpy as np
 
 from attendance.logger import AttendanceLogger
-from embeddings.manager import EmbeddingManager
-from recognition.face_recognizer import FaceRecognizer
+from embeddings.manager import META_FACE_ID, CacheVersion, EmbeddingManager
+from recognition.face_recognizer import Encoder, FaceRecognizer, locate_faces, warm_up_models
 
 class ClassAttendanceSystem:
     def __init__(
         self,
         users_dir: str = "data/users",
-        embeddings_file: str = "data/known_faces.pkl",
+        embeddings_file: str = "data/known_faces.npy",
         threshold: float = 0.5,
+        quantize_embeddings: bool = False,
+        normalize_embeddings: bool = False,
     ) -> None:
         self.embedding_manager = EmbeddingManager(users_dir, embeddings_file)
         self.logger = AttendanceLogger()
         self.threshold = threshold
+        self.quantize_embeddings = quantize_embeddings
+        self.normalize_embeddings = normalize_embeddings
         self.recognizer: Optional[FaceRecognizer] = None
+        # Version of the cache the recognizer's rows came from, as returned by the
+        # load or write itself; a second cache_version() stat could already see a
+        # newer write from another worker whose rows were never loaded
+        self._embeddings_version: Optional[CacheVersion] = None
+        # The API runs recognitions and enrollments on several threads at once. This
+        # guards swapping `recognizer` and its version; the recognizer locks its own
+        # gallery for add_embedding and matching
+        self._lock = threading.RLock()
 
     def _ensure_recognizer(self) -> None:
+        with self._lock:
+            self._refresh_recognizer()
+
+    def _refresh_recognizer(self) -> None:
+        # Another worker process may have enrolled someone and rewritten the shared
+        # embeddings cache; reload it (a cheap mmap) so every worker sees new users
+        version = self.embedding_manager.cache_version()
         if self.recognizer is None:
-            embeddings = self.embedding_manager.load()
-            self.recognizer = FaceRecognizer(embeddings, threshold=self.threshold)
+            # Cold start (the API does this in a background task at startup), so the
+            # first request doesn't pay dlib's first-call cost
+            warm_up_models()
+        if self.recognizer is None or version != self._embeddings_version:
+            self._reload_recognizer()
+
+    def _reload_recognizer(self) -> None:
+        known_ids, known_vectors, version = self.embedding_manager.load_versioned()
+        self.recognizer = FaceRecognizer(
+            known_ids,
+            known_vectors,
+            threshold=self.threshold,
+            quantize=self.quantize_embeddings,
+            normalize=self.normalize_embeddings,
+        )
+        self._embeddings_version = version
 
-    def build_database(self) -> Dict[str, List[float]]:
+    def build_database(self) -> Dict[str, np.ndarray]:
         embeddings = self.embedding_manager.build_database()
-        self.recognizer = FaceRecognizer(embeddings, threshold=self.threshold)
+        # Reload from the cache the rebuild just wrote (or a newer one), so the
+        # recorded version always matches the rows actually loaded
+        with self._lock:
+            self._reload_recognizer()
         return embeddings
 
     def recognize(self, image_path: str) -> List[Dict]:
         self._ensure_recognizer()
-        assert self.recognizer is not None
-        return self.recognizer.recognize(image_path)
+        recognizer = self.recognizer
+        assert recognizer is not None
+        return recognizer.recognize(image_path)
 
     def log_attendance(self, user_id: str, source: str = "manual") -> bool:
         return self.logger.log(user_id, source)
 
-    def recognize_frame(self, frame: np.ndarray) -> List[Dict]:
+    def recognize_frame(
+        self,
+        frame: np.ndarray,
+        encode: Optional[Encoder] = None,
+        locations: Optional[List[Tuple[int, int, int, int]]] = None,
+    ) -> List[Dict]:
         self._ensure_recognizer()
-        assert self.recognizer is not None
-        return self.recognizer.recognize_frame(frame)
+        # A concurrent swap replaces the reference; this call keeps the one it read
+        recognizer = self.recognizer
+        assert recognizer is not None
+        return recognizer.recognize_frame(frame, encode, locations)
 
     def enroll_user(self, user_id: str, face_image_bgr: np.ndarray) -> None:
         if not user_id:
             raise ValueError("user_id is required for enrollment")
+        if user_id == META_FACE_ID:
+            raise ValueError(f"user_id {META_FACE_ID!r} is reserved")
 
         rgb_face = cv2.cvtColor(face_image_bgr, cv2.COLOR_BGR2RGB)
-        encodings = face_recognition.face_encodings(rgb_face)
+        encodings = face_recognition.face_encodings(rgb_face, locate_faces(rgb_face)[:1])
         if not encodings:
             raise ValueError("Unable to encode face for enrollment")
-        embedding_vector = encodings[0].tolist()
+        embedding_vector = encodings[0].astype(np.float32)
 
         success, buffer = cv2.imencode(".jpg", face_image_bgr)
         if not success:
             raise ValueError("Failed to encode face image for storage")
         image_bytes = buffer.tobytes()
+        # The gallery is loaded at most once (cold start), before the write; after
+        # that the recognizer and the local cache are updated with just this face
+        with self._lock:
+            if self.recognizer is None:
+                self._refresh_recognizer()
         self.embedding_manager.store_user_image(user_id, image_bytes, extension="jpg")
-        self.embedding_manager.upsert_embedding(user_id, embedding_vector)
-
-        embeddings = self.embedding_manager.load()
-        self.recognizer = FaceRecognizer(embeddings, threshold=self.threshold)
\ No newline at end of file
+        base_version, written_version = self.embedding_manager.upsert_embedding(user_id, embedding_vector)
+        with self._lock:
+            # Whichever recognizer is current now (a reload may have swapped it in
+            # meanwhile) gets the face; re-adding an id just overwrites its row
+            assert self.recognizer is not None
+            self.recognizer.add_embedding(user_id, embedding_vector)
+            # Only skip the next reload if the write went on top of exactly the rows
+            # this recognizer holds; otherwise other workers' rows are still missing
+            if base_version is not None and base_version == self._embeddings_version:
+                self._embeddings_version = written_version
@@ -0,0 +1,51 @@
+"""
+Optional Numba kernels for the recognizer. Without numba installed, nearest_l2
+is None and FaceRecognizer keeps its NumPy/BLAS path.
+"""
+from __future__ import annotations
+
+import functools
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional dependency
+    njit = None
+
+if njit is not None:
+
+    @njit(cache=True, fastmath=True)
+    def nearest_l2(known, probes):
+        """
+        For each probe, index of and squared distance to the nearest gallery row,
+        with subtract/square/reduce/argmin fused into one pass and no temporaries.
+        """
+        count, dim = known.shape
+        best_idx = np.zeros(probes.shape[0], dtype=np.int64)
+        best_sq = np.zeros(probes.shape[0], dtype=np.float32)
+        for p in range(probes.shape[0]):
+            best_d2 = np.inf
+            best_i = 0
+            for i in range(count):
+                s = 0.0
+                for j in range(dim):
+                    d = known[i, j] - probes[p, j]
+                    s += d * d
+                if s < best_d2:
+                    best_d2 = s
+                    best_i = i
+            best_idx[p] = best_i
+            best_sq[p] = best_d2
+        return best_idx, best_sq
+
+else:
+    nearest_l2 = None
+
+
+@functools.lru_cache(maxsize=None)
+def warm_up() -> None:
+    # Compile (or load from the on-disk cache) before the first real frame
+    if nearest_l2 is not None:
+        sample = np.zeros((1, 128), dtype=np.float32)
+        nearest_l2(sample, sample)
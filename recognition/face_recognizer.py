@@ -1,17 +1,313 @@
 from __future__ import annotations
 
+import functools
+import threading
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
+import cv2
+import dlib
 import face_recognition
+import face_recognition.api as _fr_api
 import numpy as np
 
+from recognition import _kernels
+
+try:
+    import simsimd
+except ImportError:  # optional SIMD distance kernels; the BLAS path is used without it
+    simsimd = None
+
+try:
+    import faiss
+except ImportError:  # optional exact k-NN index for large float galleries
+    faiss = None
+
+EMBEDDING_DIM = 128
+# (image, face locations) -> one encoding per location, like face_recognition.face_encodings
+Encoder = Callable[[np.ndarray, List[Tuple[int, int, int, int]]], Sequence[np.ndarray]]
+# Enrollment photos are detected on a copy no larger than this on its long side
+DETECT_MAX_SIDE = 800
+# Gallery buffers start on a cache-line boundary (also covers AVX-512 loads)
+ALIGNMENT = 64
+# Large float galleries are first filtered on a PCA prefix of this many dimensions
+CASCADE_DIMS = 16
+CASCADE_MIN_GALLERY = 2048
+# Headroom on the prefix cut for float32 rounding in the ||a||^2 + ||b||^2 - 2ab form
+CASCADE_SLACK = 1.05
+# Float galleries up to this size use the fused Numba kernel when numba is installed
+JIT_MAX_GALLERY = 256
+# Smaller galleries fit in cache as float32 anyway; int8 matching only pays off above this
+QUANTIZE_MIN_GALLERY = 32
+# Float galleries from this size are searched with a FAISS IndexFlatL2 when faiss is
+# installed; below it the index setup and call overhead outweigh the scan
+FAISS_MIN_GALLERY = 256
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-row int8 quantization: vectors ~= q * scales[:, None].
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    max_abs = np.abs(vectors).max(axis=1) if vectors.size else np.empty(0, dtype=np.float32)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    q = np.round(vectors / scales[:, np.newaxis]).astype(np.int8)
+    return q, scales
+
+
+def aligned_empty(shape: Tuple[int, ...], dtype, alignment: int = ALIGNMENT) -> np.ndarray:
+    """
+    np.empty whose data pointer is a multiple of `alignment` bytes: over-allocate
+    a byte buffer and start the array at the first aligned offset inside it.
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.empty(nbytes + alignment, dtype=np.uint8)
+    offset = -raw.ctypes.data % alignment
+    return raw[offset : offset + nbytes].view(dtype).reshape(shape)
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0).astype(np.float32)
+
+
+def _aligned(array: np.ndarray, dtype, alignment: int = ALIGNMENT) -> np.ndarray:
+    # Contiguous, aligned arrays (e.g. the memory-mapped .npy cache, whose data
+    # starts on a 64-byte boundary) are used as-is; anything else is copied once
+    array = np.asarray(array, dtype=dtype)
+    if array.flags.c_contiguous and array.ctypes.data % alignment == 0:
+        return array
+    aligned = aligned_empty(array.shape, dtype, alignment)
+    aligned[...] = array
+    return aligned
+
+
+@functools.lru_cache(maxsize=None)
+def warm_up_models() -> None:
+    """
+    Run the HOG detector, landmark predictor and ResNet encoder once on a blank
+    image. face_recognition loads the models at import, but dlib's first pass
+    still pays page-in and allocation costs. Cached, so it runs once per process.
+    """
+    blank = np.zeros((150, 150, 3), dtype=np.uint8)
+    face_recognition.face_locations(blank)
+    face_recognition.face_encodings(blank, [(0, 150, 150, 0)])
+
+
+def encode_faces(image: np.ndarray, locations: List[Tuple[int, int, int, int]]) -> List[np.ndarray]:
+    """
+    face_recognition.face_encodings for known boxes, with every face's landmarks
+    handed to dlib's encoder in one compute_face_descriptor call, so the ResNet
+    runs as a single batch (one CUDA launch on GPU builds) instead of once per
+    face. Same 5-point predictor and jitter setting, so the vectors are identical.
+    """
+    if len(locations) <= 1:
+        return face_recognition.face_encodings(image, locations)
+    shapes = dlib.full_object_detections()
+    for top, right, bottom, left in locations:
+        shapes.append(_fr_api.pose_predictor_5_point(image, dlib.rectangle(left, top, right, bottom)))
+    descriptors = _fr_api.face_encoder.compute_face_descriptor(image, shapes, 1)
+    return [np.array(descriptor) for descriptor in descriptors]
+
+
+def locate_faces(image: np.ndarray, max_side: int = DETECT_MAX_SIDE) -> List[Tuple[int, int, int, int]]:
+    """
+    Run the HOG detector on a downscaled copy of large images (its cost grows with
+    pixel count) and return boxes in the original image's coordinates, so the
+    encodings can still be computed from the full-resolution pixels.
+    """
+    longest = max(image.shape[:2])
+    return detect_scaled(image, min(1.0, max_side / longest))
+
+
+def detect_scaled(image: np.ndarray, scale: float) -> List[Tuple[int, int, int, int]]:
+    """
+    face_locations on the image resized by `scale`, boxes mapped back to full size.
+    """
+    if scale >= 1.0:
+        return face_recognition.face_locations(image)
+    small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return _unscale_boxes(face_recognition.face_locations(small), scale, image.shape)
+
+
+def detect_gray(
+    gray: np.ndarray, scale: float, full_shape: Tuple[int, ...]
+) -> List[Tuple[int, int, int, int]]:
+    """
+    HOG detection on a grayscale frame already resized by `scale`, e.g. one shared
+    with a blur check; boxes are mapped back to a `full_shape` frame. Same detector
+    and upsampling as face_locations, but on colour input dlib takes the strongest
+    channel gradient per pixel, so one channel is cheaper and can shift borderline
+    detections slightly.
+    """
+    height, width = gray.shape[:2]
+    boxes = [
+        (max(rect.top(), 0), min(rect.right(), width), min(rect.bottom(), height), max(rect.left(), 0))
+        for rect in _fr_api.face_detector(gray, 1)
+    ]
+    return _unscale_boxes(boxes, scale, full_shape)
+
+
+def _unscale_boxes(
+    boxes: List[Tuple[int, int, int, int]], scale: float, full_shape: Tuple[int, ...]
+) -> List[Tuple[int, int, int, int]]:
+    if scale >= 1.0:
+        return boxes
+    height, width = full_shape[:2]
+    return [
+        (
+            min(height, round(top / scale)),
+            min(width, round(right / scale)),
+            min(height, round(bottom / scale)),
+            min(width, round(left / scale)),
+        )
+        for top, right, bottom, left in boxes
+    ]
+
 
 class FaceRecognizer:
-    def __init__(self, embeddings: Dict[str, List[float]], threshold: float = 0.5) -> None:
+    def __init__(
+        self,
+        known_ids: Sequence[str],
+        known_vectors: np.ndarray,
+        threshold: float = 0.5,
+        quantize: bool = False,
+        normalize: bool = False,
+    ) -> None:
         self.threshold = threshold
-        self.known_ids = list(embeddings.keys())
-        self.known_vectors = np.array(list(embeddings.values()))
+        self.quantize = quantize
+        # add_embedding regrows buffers and re-points the known_* views; matching
+        # must not read them halfway through. Detection and encoding run unlocked
+        self._lock = threading.Lock()
+        # Opt-in: unit-normalize gallery and probes so ||a - b||^2 = 2 - 2 a.b and the
+        # match is a single dot product. dlib encodings are only near unit norm, so
+        # distances shift slightly against the threshold; off by default
+        self.normalize = normalize
+        self.known_ids = list(known_ids)
+        # Contiguous float32 (N, D) gallery, row i for known_ids[i], plus cached squared
+        # norms, so matching is ||p||^2 + ||k||^2 - 2 p.k with the cross term as one BLAS
+        # call. A C-contiguous, aligned float32 input (e.g. the memory-mapped cache) is
+        # used as-is.
+        self.known_vectors = _aligned(
+            np.asarray(known_vectors, dtype=np.float32).reshape(len(self.known_ids), -1)
+            if self.known_ids
+            else np.empty((0, EMBEDDING_DIM), dtype=np.float32),
+            np.float32,
+        )
+        if normalize and self.known_ids:
+            # Never written in place: the input may be the shared read-only mmap
+            self.known_vectors = _aligned(_unit_rows(self.known_vectors), np.float32)
+        self.known_sqnorms = np.einsum("ij,ij->i", self.known_vectors, self.known_vectors)
+        # Optional int8 copy of the gallery (4x smaller) used for the dot products;
+        # norms stay exact from the float vectors
+        if quantize:
+            self.known_q, self.known_scales = quantize_int8(self.known_vectors)
+        self._index: Dict[str, int] = {user_id: idx for idx, user_id in enumerate(self.known_ids)}
+        # known_* are views of the first len(known_ids) rows of these buffers, which
+        # grow by doubling so enrollments append in amortized O(1)
+        self._vector_buf = self.known_vectors
+        self._sqnorm_buf = self.known_sqnorms
+        if quantize:
+            self._q_buf, self._scale_buf = self.known_q, self.known_scales
+        # Cascade: an orthonormal projection never lengthens a difference vector, so a
+        # gallery row whose prefix distance already exceeds the threshold cannot match
+        # and is skipped before the full 128-D compare. Axes are fixed at construction;
+        # later enrollments are projected onto the same axes, which keeps this exact
+        self._components: Optional[np.ndarray] = None
+        # Exact L2 index over known_vectors (row i is FAISS id i); it supersedes the
+        # cascade, so the SVD is skipped when it is built
+        self._faiss_index = None
+        if _kernels.nearest_l2 is not None and not quantize:
+            _kernels.warm_up()
+        if faiss is not None and not quantize and len(self.known_ids) >= FAISS_MIN_GALLERY:
+            self._build_faiss_index()
+        elif not quantize and len(self.known_ids) >= CASCADE_MIN_GALLERY:
+            centered = self.known_vectors - self.known_vectors.mean(axis=0)
+            _, _, vt = np.linalg.svd(centered, full_matrices=False)
+            self._components = np.ascontiguousarray(vt[:CASCADE_DIMS].T, dtype=np.float32)
+            self.known_prefix = _aligned(self.known_vectors @ self._components, np.float32)
+            self.known_prefix_sqnorms = np.einsum("ij,ij->i", self.known_prefix, self.known_prefix)
+            self._prefix_buf = self.known_prefix
+            self._prefix_sqnorm_buf = self.known_prefix_sqnorms
+
+    def add_embedding(self, user_id: str, vector: np.ndarray) -> None:
+        """
+        Add or replace a single user's embedding without rebuilding the gallery.
+        """
+        with self._lock:
+            self._add_embedding(user_id, vector)
+
+    def _add_embedding(self, user_id: str, vector: np.ndarray) -> None:
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.normalize:
+            vector = _unit_rows(vector[np.newaxis, :])[0]
+        idx = self._index.get(user_id)
+        count = len(self.known_ids)
+        if idx is None:
+            idx = count
+            count += 1
+            if count > len(self._vector_buf):
+                self._reserve(max(2 * len(self._vector_buf), 16))
+        elif not self._vector_buf.flags.writeable:
+            # Gallery is still the read-only mmap of the cache; copy before writing
+            self._reserve(len(self._vector_buf))
+
+        self._vector_buf[idx] = vector
+        self._sqnorm_buf[idx] = vector @ vector
+        if self.quantize:
+            q, scale = quantize_int8(vector)
+            self._q_buf[idx] = q[0]
+            self._scale_buf[idx] = scale[0]
+        if self._components is not None:
+            prefix = vector @ self._components
+            self._prefix_buf[idx] = prefix
+            self._prefix_sqnorm_buf[idx] = prefix @ prefix
+        appended = idx == len(self.known_ids)
+        if appended:
+            self.known_ids.append(user_id)
+            self._index[user_id] = idx
+        self._sync_views(count)
+        if self._faiss_index is not None:
+            if appended:
+                self._faiss_index.add(self.known_vectors[idx : idx + 1])
+            else:
+                # IndexFlatL2 cannot overwrite a row in place; re-enrollment is rare
+                self._build_faiss_index()
+        elif faiss is not None and not self.quantize and count >= FAISS_MIN_GALLERY:
+            self._build_faiss_index()
+
+    def _build_faiss_index(self) -> None:
+        index = faiss.IndexFlatL2(self.known_vectors.shape[1])
+        index.add(self.known_vectors)
+        self._faiss_index = index
+
+    def _reserve(self, capacity: int) -> None:
+        count = len(self.known_ids)
+
+        def regrow(buf: np.ndarray) -> np.ndarray:
+            grown = aligned_empty((capacity,) + buf.shape[1:], buf.dtype)
+            grown[:count] = buf[:count]
+            return grown
+
+        self._vector_buf = regrow(self._vector_buf)
+        self._sqnorm_buf = regrow(self._sqnorm_buf)
+        if self.quantize:
+            self._q_buf = regrow(self._q_buf)
+            self._scale_buf = regrow(self._scale_buf)
+        if self._components is not None:
+            self._prefix_buf = regrow(self._prefix_buf)
+            self._prefix_sqnorm_buf = regrow(self._prefix_sqnorm_buf)
+
+    def _sync_views(self, count: int) -> None:
+        self.known_vectors = self._vector_buf[:count]
+        self.known_sqnorms = self._sqnorm_buf[:count]
+        if self.quantize:
+            self.known_q = self._q_buf[:count]
+            self.known_scales = self._scale_buf[:count]
+        if self._components is not None:
+            self.known_prefix = self._prefix_buf[:count]
+            self.known_prefix_sqnorms = self._prefix_sqnorm_buf[:count]
 
     def detect_faces(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
         return face_recognition.face_locations(image)
@@ -23,27 +319,142 @@ class FaceRecognizer:
         return encodings[0]
 
     def match_embedding(self, embedding: np.ndarray) -> Tuple[str, float]:
-        if not len(self.known_vectors):
-            return "Unknown", 1.0
-        distances = np.linalg.norm(self.known_vectors - embedding, axis=1)
-        best_idx = int(np.argmin(distances))
-        best_dist = float(distances[best_idx])
-        if best_dist <= self.threshold:
-            return self.known_ids[best_idx], best_dist
-        return "Unknown", best_dist
+        return self.match_embeddings([embedding])[0]
+
+    def match_embeddings(self, embeddings: Sequence[np.ndarray]) -> List[Tuple[str, float]]:
+        """
+        Match every face found in a frame against the gallery at once: one
+        (M, D) x (D, N) product instead of one distance pass per face.
+        """
+        if not len(embeddings):
+            return []
+        probes = np.ascontiguousarray(
+            np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        )
+        if self.normalize:
+            probes = _unit_rows(probes)
+        with self._lock:
+            if not self.known_ids:
+                return [("Unknown", 1.0)] * len(embeddings)
+            best_idx, best_sq = self._nearest(probes)
+            best_ids = [self.known_ids[idx] for idx in best_idx.tolist()]
+        best_dists = np.sqrt(np.maximum(best_sq, 0.0))
+
+        matches: List[Tuple[str, float]] = []
+        for user_id, dist in zip(best_ids, best_dists.tolist()):
+            if dist <= self.threshold:
+                matches.append((user_id, dist))
+            else:
+                matches.append(("Unknown", dist))
+        return matches
+
+    def _nearest(self, probes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Index of, and squared distance to, the closest gallery vector for each probe.
+        """
+        quantized = self.quantize and len(self.known_ids) >= QUANTIZE_MIN_GALLERY
+        if self._faiss_index is not None and not quantized:
+            sq_dists, ids = self._faiss_index.search(probes, 1)
+            return ids[:, 0], sq_dists[:, 0]
+        if self._components is not None and not quantized:
+            return self._nearest_cascade(probes)
+        return self._nearest_full(probes, quantized)
+
+    def _nearest_cascade(self, probes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        probe_prefix = probes @ self._components
+        prefix_sq = probe_prefix @ self.known_prefix.T
+        prefix_sq *= -2.0
+        prefix_sq += self.known_prefix_sqnorms[np.newaxis, :]
+        prefix_sq += np.einsum("ij,ij->i", probe_prefix, probe_prefix)[:, np.newaxis]
+        limit = (self.threshold * CASCADE_SLACK) ** 2
+
+        best_idx = np.zeros(len(probes), dtype=np.intp)
+        best_sq = np.zeros(len(probes), dtype=np.float32)
+        unresolved: List[int] = []
+        for row, probe in enumerate(probes):
+            candidates = np.flatnonzero(prefix_sq[row] <= limit)
+            if len(candidates):
+                diffs = self.known_vectors[candidates] - probe
+                sq = np.einsum("ij,ij->i", diffs, diffs)
+                best = int(np.argmin(sq))
+                if sq[best] <= self.threshold**2:
+                    best_idx[row] = candidates[best]
+                    best_sq[row] = sq[best]
+                    continue
+            # Nothing within the threshold: still report the true nearest distance
+            unresolved.append(row)
+        if unresolved:
+            best_idx[unresolved], best_sq[unresolved] = self._nearest_full(probes[unresolved], False)
+        return best_idx, best_sq
+
+    def _nearest_full(self, probes: np.ndarray, quantized: bool) -> Tuple[np.ndarray, np.ndarray]:
+        if (
+            _kernels.nearest_l2 is not None
+            and not quantized
+            and len(self.known_ids) <= JIT_MAX_GALLERY
+        ):
+            # Small galleries: per-call NumPy overhead outweighs the arithmetic
+            return _kernels.nearest_l2(self.known_vectors, probes)
+        rows = np.arange(len(probes))
+        if self.normalize:
+            # Unit vectors: nearest is the largest dot product, ||p - k||^2 = 2 - 2 p.k
+            sims = self._dot_gallery(probes, quantized)
+            best_idx = np.argmax(sims, axis=1)
+            return best_idx, 2.0 - 2.0 * sims[rows, best_idx]
+        if simsimd is not None and not quantized:
+            # Fused subtract-square-accumulate in SIMD registers, no (M, N) temporaries
+            sq_dists = np.asarray(simsimd.cdist(probes, self.known_vectors, metric="sqeuclidean"))
+            best_idx = np.argmin(sq_dists, axis=1)
+            return best_idx, sq_dists[rows, best_idx]
+        # ||p||^2 is constant along each row, so the argmin only needs ||k||^2 - 2 p.k;
+        # the probe norm is added back for the winning entries alone
+        scores = self._dot_gallery(probes, quantized)
+        scores *= -2.0
+        scores += self.known_sqnorms[np.newaxis, :]
+        best_idx = np.argmin(scores, axis=1)
+        return best_idx, scores[rows, best_idx] + np.einsum("ij,ij->i", probes, probes)
+
+    def _dot_gallery(self, probes: np.ndarray, quantized: bool) -> np.ndarray:
+        if not quantized:
+            return probes @ self.known_vectors.T
+        probes_q, probe_scales = quantize_int8(probes)
+        if simsimd is not None:
+            # Exact int8 dot products from SimSIMD's integer kernels
+            dots = np.asarray(simsimd.cdist(probes_q, self.known_q, metric="dot"), dtype=np.float32)
+        else:
+            # int8 x int8 accumulated in int32 (int16 would overflow at D=128)
+            dots = np.matmul(probes_q, self.known_q.T, dtype=np.int32).astype(np.float32)
+        # Undo both per-row scales at once
+        dots *= probe_scales[:, np.newaxis] * self.known_scales[np.newaxis, :]
+        return dots
 
     def recognize(self, image_path: str) -> List[Dict]:
         image = face_recognition.load_image_file(Path(image_path))
         return self._recognize_from_image(image)
 
-    def recognize_frame(self, frame: np.ndarray) -> List[Dict]:
-        return self._recognize_from_image(frame)
+    def recognize_frame(
+        self,
+        frame: np.ndarray,
+        encode: Optional[Encoder] = None,
+        locations: Optional[List[Tuple[int, int, int, int]]] = None,
+    ) -> List[Dict]:
+        """
+        `encode(image, locations)` replaces encode_faces, e.g. to
+        reuse embeddings across video frames. Passing `locations` (full-frame
+        boxes, e.g. from detect_gray on a downscaled frame) skips detection.
+        """
+        return self._recognize_from_image(frame, encode, locations)
 
-    def _recognize_from_image(self, image: np.ndarray) -> List[Dict]:
+    def _recognize_from_image(
+        self,
+        image: np.ndarray,
+        encode: Optional[Encoder] = None,
+        locations: Optional[List[Tuple[int, int, int, int]]] = None,
+    ) -> List[Dict]:
         results: List[Dict] = []
-        locations = self.detect_faces(image)
-        encodings = face_recognition.face_encodings(image, locations)
-        for location, encoding in zip(locations, encodings):
-            user_id, distance = self.match_embedding(encoding)
+        if locations is None:
+            locations = self.detect_faces(image)
+        encodings = (encode or encode_faces)(image, locations)
+        for location, (user_id, distance) in zip(locations, self.match_embeddings(encodings)):
             results.append({"user_id": user_id, "distance": distance, "bbox": location})
         return results
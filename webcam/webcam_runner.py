@@ -1,20 +1,30 @@
 from __future__ import annotations
 
-from typing import List, Dict, Optional, Set, Tuple
+from collections import deque
+from typing import Deque, List, Dict, NamedTuple, Optional, Set, Tuple
+import threading
 import time
 
 import cv2
 import numpy as np
 
 from core.system import ClassAttendanceSystem
+from recognition.face_recognizer import detect_gray, encode_faces
 
 
 FRAME_SKIP = 5  # process every Nth frame for performance
 UNKNOWN_PROMPT_COOLDOWN = 5  # seconds
-BLUR_THRESHOLD = 250.0  # Laplacian variance threshold
+# Laplacian variance threshold, measured on the DETECT_SCALE gray frame. Downscaling
+# raises the score (roughly 3-8x at 0.5 for the same scene), so the old full-frame
+# 250 was recalibrated for half size; retune it together with DETECT_SCALE
+BLUR_THRESHOLD = 1250.0
 MAX_FACES = 1
 STILLNESS_SECONDS = 3.0
 AUTO_EXIT_DELAY = 5  # seconds after success before closing webcam
+DETECT_SCALE = 0.5  # blur gate and HOG detection share one half-size gray frame; encodings use full resolution
+USE_OPENCL = cv2.ocl.haveOpenCL()  # OpenCV T-API for the blur gate when a device exists
+REUSE_MIN_IOU = 0.8  # box overlap needed to reuse the previous face embedding
+REUSE_MAX_PIXEL_DIFF = 3.0  # mean abs grayscale change allowed inside that box
 
 
 def start_webcam_recognition(frame_skip: int = FRAME_SKIP) -> None:
@@ -25,45 +35,68 @@ def start_webcam_recognition(frame_skip: int = FRAME_SKIP) -> None:
     if not cap.isOpened():
         raise RuntimeError("Cannot open webcam")
 
+    # Capture, recognition and display each get a thread; OpenCV and dlib release
+    # the GIL, so a slow recognize no longer stalls the grab or the window. The
+    # deques hold only the newest item, dropping frames the worker could not use.
+    stop = threading.Event()
+    frames: Deque[Tuple[int, np.ndarray]] = deque(maxlen=1)
+    pending: Deque[np.ndarray] = deque(maxlen=1)
+    outcomes: Deque[_Outcome] = deque(maxlen=1)
+    errors: List[BaseException] = []
+    # Enrollment grows the recognizer's gallery; keep it out of a running match
+    recognizer_lock = threading.Lock()
+    grabber = threading.Thread(target=_grab_loop, args=(cap, frames, stop), daemon=True)
+    worker = threading.Thread(
+        target=_recognize_loop,
+        args=(system, recognizer_lock, pending, outcomes, stop, errors),
+        daemon=True,
+    )
+
     frame_count = 0
+    last_seq = -1
     logged_users: Set[str] = set()
     last_prompt_time = 0.0
     pending_face: Optional[np.ndarray] = None
     results: List[Dict] = []
+    ids: Tuple[str, ...] = ()  # user_id per result, built once per processed frame
     warning_message: Optional[str] = None
     is_blurry = False
     stillness_start: Optional[float] = None
     multi_face_detected = False
     success_time: Optional[float] = None
     last_sharpness: Optional[float] = None
+    # Overlays are drawn on this reused buffer; `frame` stays clean because unknown
+    # face crops are views into it and "s" saves it
+    display_frame: Optional[np.ndarray] = None
 
+    grabber.start()
+    worker.start()
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        while not stop.is_set():
+            if not frames or frames[-1][0] == last_seq:
+                # Nothing new from the camera yet; keep the window responsive
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+                continue
+            last_seq, frame = frames[-1]
 
-            display_frame = frame.copy()
-            shutdown_eta: Optional[float] = None
-            current_sharpness: Optional[float] = None
             if frame_count % frame_skip == 0:
-                current_sharpness = _sharpness_score(frame)
-                last_sharpness = current_sharpness
-                is_blurry = current_sharpness < BLUR_THRESHOLD
-                now = time.time()
+                pending.append(frame)
+
+            if outcomes:
+                outcome = outcomes.popleft()
+                now = outcome.timestamp
+                last_sharpness = outcome.sharpness
+                is_blurry = outcome.results is None
                 if is_blurry:
                     multi_face_detected = False
-                    results = []
-                    warning_message = (
-                        "DO NOT MOVE MUCH"
-                        if current_sharpness is None
-                        else f"DO NOT MOVE MUCH (sharpness {current_sharpness:.0f})"
-                    )
+                    results, ids = [], ()
+                    warning_message = f"DO NOT MOVE MUCH (sharpness {outcome.sharpness:.0f})"
                     pending_face = None
                     stillness_start = None
                 else:
-                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    results = system.recognize_frame(rgb_frame)
+                    results = outcome.results
+                    ids = tuple(result["user_id"] for result in results)
                     face_count = len(results)
                     if face_count == 0:
                         multi_face_detected = False
@@ -75,29 +108,35 @@ def start_webcam_recognition(frame_skip: int = FRAME_SKIP) -> None:
                         warning_message = "ONE PERSON AT A TIME"
                         pending_face = None
                         stillness_start = None
-                        results = []
+                        results, ids = [], ()
                     else:
                         multi_face_detected = False
                         warning_message = None
-                        if _log_recognitions(system, results, logged_users):
+                        if _log_recognitions(system, ids, logged_users):
                             success_time = now
-                        if _contains_unknown(results):
+                        if _contains_unknown(ids):
                             stillness_start = stillness_start or now
                             elapsed = now - stillness_start
                             if elapsed < STILLNESS_SECONDS:
                                 warning_message = f"HOLD STILL {STILLNESS_SECONDS - elapsed:.1f}s"
                             elif pending_face is None:
-                                pending_face = _capture_unknown_face(frame, results)
+                                # Crop from the frame the boxes were computed on
+                                pending_face = _capture_unknown_face(outcome.frame, results, ids)
                         else:
                             stillness_start = None
                             pending_face = None
 
+            if display_frame is None or display_frame.shape != frame.shape:
+                display_frame = np.empty_like(frame)
+            np.copyto(display_frame, frame)
+            shutdown_eta: Optional[float] = None
             if success_time is not None:
                 shutdown_eta = max(0.0, AUTO_EXIT_DELAY - (time.time() - success_time))
 
             _display_results(
                 display_frame,
                 results,
+                ids,
                 warning_message,
                 shutdown_eta,
                 last_sharpness,
@@ -111,7 +150,7 @@ def start_webcam_recognition(frame_skip: int = FRAME_SKIP) -> None:
 
             if not is_blurry and not multi_face_detected:
                 pending_face, last_prompt_time, enrolled = _maybe_prompt_for_enrollment(
-                    system, pending_face, last_prompt_time
+                    system, pending_face, last_prompt_time, recognizer_lock
                 )
                 if enrolled:
                     success_time = time.time()
@@ -121,13 +160,132 @@ def start_webcam_recognition(frame_skip: int = FRAME_SKIP) -> None:
                 break
             frame_count += 1
     finally:
+        stop.set()
+        grabber.join()
+        worker.join()
         cap.release()
         cv2.destroyAllWindows()
+    if errors:
+        raise errors[0]
+
+
+class _Outcome(NamedTuple):
+    frame: np.ndarray
+    timestamp: float
+    sharpness: float
+    results: Optional[List[Dict]]  # None when the frame failed the blur gate
+
+
+def _grab_loop(cap, frames: Deque[Tuple[int, np.ndarray]], stop: threading.Event) -> None:
+    seq = 0
+    while not stop.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append((seq, frame))
+        seq += 1
+    stop.set()
+
+
+def _recognize_loop(
+    system: ClassAttendanceSystem,
+    lock: threading.Lock,
+    pending: Deque[np.ndarray],
+    outcomes: Deque[_Outcome],
+    stop: threading.Event,
+    errors: List[BaseException],
+) -> None:
+    embedding_cache = _EmbeddingCache()
+    # dlib wants RGB, but VideoCapture always delivers BGR (CAP_PROP_CONVERT_RGB only
+    # toggles conversion *to* BGR), so the swap stays; it writes into one reused
+    # buffer instead of allocating a full frame per tick. Nothing keeps a view of it:
+    # the cache stores its own gray crops and outcomes carry the BGR frame
+    rgb_frame: Optional[np.ndarray] = None
+    try:
+        while not stop.is_set():
+            try:
+                frame = pending.popleft()
+            except IndexError:
+                stop.wait(0.005)
+                continue
+            timestamp = time.time()
+            gray = _small_gray(frame)
+            sharpness = _sharpness_score(gray)
+            results: Optional[List[Dict]] = None
+            if sharpness >= BLUR_THRESHOLD:
+                if isinstance(gray, cv2.UMat):
+                    gray = gray.get()
+                locations = detect_gray(gray, DETECT_SCALE, frame.shape)
+                if rgb_frame is None or rgb_frame.shape != frame.shape:
+                    rgb_frame = np.empty_like(frame)
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+                with lock:
+                    results = system.recognize_frame(
+                        rgb_frame, encode=embedding_cache.encode, locations=locations
+                    )
+            outcomes.append(_Outcome(frame, timestamp, sharpness, results))
+    except BaseException as exc:  # surfaced on the main thread after shutdown
+        errors.append(exc)
+        stop.set()
+
+
+class _EmbeddingCache:
+    """
+    Single-face cache (MAX_FACES is 1): while the detected box overlaps the last
+    encoded one and the pixels inside it barely changed, reuse that embedding
+    instead of running dlib's encoder again.
+    """
+
+    def __init__(self) -> None:
+        self.bbox: Optional[Tuple[int, int, int, int]] = None
+        self.gray_crop: Optional[np.ndarray] = None
+        self.embedding: Optional[np.ndarray] = None
+
+    def encode(self, image: np.ndarray, locations: List[Tuple[int, int, int, int]]) -> List[np.ndarray]:
+        if len(locations) != 1:
+            self.embedding = None
+            return encode_faces(image, locations)
+        bbox = locations[0]
+        gray_crop = _gray_crop(image, bbox)
+        if self._unchanged(bbox, gray_crop):
+            return [self.embedding]
+        encodings = encode_faces(image, locations)
+        if encodings:
+            self.bbox, self.gray_crop, self.embedding = bbox, gray_crop, encodings[0]
+        return encodings
+
+    def _unchanged(self, bbox: Tuple[int, int, int, int], gray_crop: Optional[np.ndarray]) -> bool:
+        if self.embedding is None or gray_crop is None or self.gray_crop is None:
+            return False
+        if _iou(bbox, self.bbox) <= REUSE_MIN_IOU:
+            return False
+        previous = self.gray_crop
+        if previous.shape != gray_crop.shape:
+            previous = cv2.resize(previous, (gray_crop.shape[1], gray_crop.shape[0]))
+        return float(cv2.absdiff(previous, gray_crop).mean()) < REUSE_MAX_PIXEL_DIFF
+
+
+def _gray_crop(image: np.ndarray, bbox: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+    top, right, bottom, left = bbox
+    crop = image[max(0, top):bottom, max(0, left):right]
+    if crop.size == 0:
+        return None
+    return cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
 
 
-def _capture_unknown_face(frame, results: List[Dict]) -> Optional[np.ndarray]:
-    for result in results:
-        if result["user_id"] != "Unknown":
+def _iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _capture_unknown_face(frame, results: List[Dict], ids: Tuple[str, ...]) -> Optional[np.ndarray]:
+    for user_id, result in zip(ids, results):
+        if user_id != "Unknown":
             continue
         face_roi = _extract_face_roi(frame, result["bbox"])
         if face_roi is not None:
@@ -139,6 +297,7 @@ def _maybe_prompt_for_enrollment(
     system: ClassAttendanceSystem,
     pending_face: Optional[np.ndarray],
     last_prompt_time: float,
+    lock: threading.Lock,
 ) -> Tuple[Optional[np.ndarray], float, bool]:
     if pending_face is None:
         return None, last_prompt_time, False
@@ -153,7 +312,8 @@ def _maybe_prompt_for_enrollment(
         return pending_face, now, False
 
     try:
-        system.enroll_user(user_id, pending_face)
+        with lock:
+            system.enroll_user(user_id, pending_face)
         print(f"[INFO] Enrolled new user '{user_id}'.")
         return None, now, True
     except Exception as exc:
@@ -162,35 +322,42 @@ def _maybe_prompt_for_enrollment(
 
 
 def _extract_face_roi(frame, bbox, padding: int = 20) -> Optional:
-    top, right, bottom, left = bbox
     height, width = frame.shape[:2]
-    top = max(0, top - padding)
-    bottom = min(height, bottom + padding)
-    left = max(0, left - padding)
-    right = min(width, right + padding)
+    padded = np.asarray(bbox) + (-padding, padding, padding, -padding)
+    top, right, bottom, left = np.clip(padded, 0, (height, width, height, width)).tolist()
     if top >= bottom or left >= right:
         return None
     return frame[top:bottom, left:right]
 
 
-def _sharpness_score(frame: np.ndarray) -> float:
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    variance = cv2.Laplacian(gray, cv2.CV_64F).var()
-    return float(variance)
+def _small_gray(frame: np.ndarray):
+    # One resize + BGR->GRAY per processed frame, shared by the blur gate and HOG.
+    # With OpenCL the result is a UMat, so the Laplacian also stays on the GPU
+    source = cv2.UMat(frame) if USE_OPENCL else frame
+    small = cv2.resize(source, None, fx=DETECT_SCALE, fy=DETECT_SCALE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def _sharpness_score(gray) -> float:
+    # CV_32F halves the Laplacian's bandwidth versus CV_64F
+    laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+    _, stddev = cv2.meanStdDev(laplacian)
+    if isinstance(stddev, cv2.UMat):
+        stddev = stddev.get()
+    return float(stddev[0, 0]) ** 2
 
 
-def _contains_unknown(results: List[Dict]) -> bool:
-    return any(result["user_id"] == "Unknown" for result in results)
+def _contains_unknown(ids: Tuple[str, ...]) -> bool:
+    return "Unknown" in ids
 
 
 def _contains_multiple_faces(results: List[Dict]) -> bool:
     return len(results) > MAX_FACES
 
 
-def _log_recognitions(system: ClassAttendanceSystem, results: List[Dict], logged_users: Set[str]) -> bool:
+def _log_recognitions(system: ClassAttendanceSystem, ids: Tuple[str, ...], logged_users: Set[str]) -> bool:
     logged_any = False
-    for result in results:
-        user_id = result["user_id"]
+    for user_id in ids:
         if user_id == "Unknown":
             continue
         if user_id in logged_users:
@@ -205,16 +372,18 @@ def _log_recognitions(system: ClassAttendanceSystem, results: List[Dict], logged
 def _display_results(
     frame,
     results,
+    ids: Tuple[str, ...],
     warning_message: Optional[str] = None,
     shutdown_eta: Optional[float] = None,
     sharpness_value: Optional[float] = None,
 ):
-    recognized = any(result["user_id"] != "Unknown" for result in results)
-    for result in results:
-        top, right, bottom, left = result["bbox"]
-        color = (0, 255, 0) if result["user_id"] != "Unknown" else (0, 0, 255)
+    known = np.array([user_id != "Unknown" for user_id in ids], dtype=bool)
+    recognized = bool(known.any())
+    bboxes = np.array([result["bbox"] for result in results], dtype=np.int32).reshape(-1, 4)
+    colors = np.where(known[:, None], (0, 255, 0), (0, 0, 255)).tolist()
+    for user_id, result, (top, right, bottom, left), color in zip(ids, results, bboxes.tolist(), colors):
         cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-        label = f"{result['user_id']} ({result['distance']:.2f})"
+        label = f"{user_id} ({result['distance']:.2f})"
         cv2.putText(frame, label, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
     if recognized:
         cv2.putText(